@@ -7,18 +7,31 @@ parser = SectionedDocumentParser(
     max_chunk_length=500, # maximum number of words allowed in a chunk
 )
 chunks = parser.split(text)
+# or, for many documents in parallel
+chunks_per_document = parser.split_batch(texts)
 """
+import os
 import re
 import warnings
-from typing import List
-from functools import total_ordering
-from packaging.version import Version
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Tuple, Union
+from functools import lru_cache, total_ordering
 
 import logging
 
+logger = logging.getLogger(__name__)
+
 class NoSectionsFound(Exception):
     pass
 
+@lru_cache
+def _compile_re2(pattern: str):
+    # re2 is an optional dependency, only needed for regex_backend="re2"
+    import re2
+    # multiline flag set inline, as the re2 bindings don't take `re` flags
+    return re2.compile("(?m)" + pattern)
+
 @total_ordering
 class DottedSection:
     """
@@ -34,15 +47,24 @@ class DottedSection:
     It also allows to build a traversable tree of sections through its parent, children and right_sibling attributes.
 
     In order to build parsers for different sectioning formats, subclass this class and override
-    the regexes. Override the comparison methods (such as `is_child_of`) if necessary. Note all of the methods
+    the regexes. The first capture group of `section_regex` must be the full section title.
+    Override the comparison methods (such as `is_child_of`) if necessary. Note all of the methods
     in this class are expected for it (overriden or not) in order to work.
     """
 
-    numbering_regex = r"\d+(\.\d+)*"
+    numbering_regex = r"\d+(?:\.\d+)*"
     stopwords = ["the", "or", "and", "to", "in", "on", "at", "of", "for"]
     first_title_word_regex = r"\s[A-Z(][a-zA-Z0-9)/+-]*"
-    following_title_words_regex = r'(\s([A-Z(][a-zA-Z0-9)/+-]*|' + "|".join(stopwords) + r'))*'
+    following_title_words_regex = r'(?:\s(?:[A-Z(][a-zA-Z0-9)/+-]*|' + "|".join(stopwords) + r'))*'
     section_regex = r'^\s+(' + numbering_regex + first_title_word_regex + following_title_words_regex + r')$'
+    _NUMBERING_RE = re.compile(numbering_regex)
+    _SECTION_RE = re.compile(section_regex, re.MULTILINE)
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # recompile the patterns once per class, so that overridden regexes are honoured
+        cls._NUMBERING_RE = re.compile(cls.numbering_regex)
+        cls._SECTION_RE = re.compile(cls.section_regex, re.MULTILINE)
 
     def __init__(
         self,
@@ -56,24 +78,42 @@ class DottedSection:
         self.children = []
         self.right_sibling = None
         self.parent = parent
+        # parse the numbering once, comparisons and tree building reuse it
+        self._num_str = self._NUMBERING_RE.match(title).group(0)
+        self._num_tuple = tuple(int(part) for part in self._num_str.split('.'))
+        # lineage string, computed lazily and reset by `add_child` and `set_parent`
+        self._lineage = None
 
     def add_child(self, child: "DottedSection"):
         self.children.append(child)
         child.parent = self
+        child._reset_lineage()
         return self
     
     def set_right_sibling(self, right_sibling: "DottedSection"):
         if self.right_sibling is not None:
-            warnings.warn("Setting right sibling when it already exists")
+            if __debug__ and logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"Overwriting right sibling of section {self.title}")
         self.right_sibling = right_sibling
         return self
     
     def set_parent(self, parent: "DottedSection"):
         if self.parent is not None:
-            warnings.warn("Setting parent when it already exists")
+            if __debug__ and logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"Overwriting parent of section {self.title}")
         self.parent = parent
+        self._reset_lineage()
         return self
     
+    def _reset_lineage(self):
+        # a cached lineage is stale once the node or any of its ancestors is re-parented
+        nodes = [self]
+        while nodes:
+            node = nodes.pop()
+            if node._lineage is not None:
+                node._lineage = None
+                nodes.extend(node.children)
+    
     def get_children(self):
         return self.children
     
@@ -85,21 +125,21 @@ class DottedSection:
     
     @property
     def number(self):
-        return re.match(self.numbering_regex, self.title).group(0)
+        return self._num_str
     
     def __eq__(self, other):
-        return self.number == other.number
+        return self._num_tuple == other._num_tuple
     
     def __lt__(self, other):
-        return Version(self.number) < Version(other.number)
+        return self._num_tuple < other._num_tuple
     
     def is_child_of(self, other: "DottedSection") -> bool:
         """Returns True if this section is a child of the other section
         """        
-        self_numbering = list(map(int, self.number.split('.')))
-        other_numbering = list(map(int, other.number.split('.')))
-        # Check if the child starts with the parent parts
-        return other_numbering == self_numbering[:len(other_numbering)] and self != other
+        self_numbering = self._num_tuple
+        other_numbering = other._num_tuple
+        # Check if the child is deeper and starts with the parent parts
+        return len(self_numbering) > len(other_numbering) and self_numbering[:len(other_numbering)] == other_numbering
     
     def is_parent_of(self, other: "DottedSection") -> bool:
         """Returns True if this section is a parent of the other section
@@ -109,16 +149,24 @@ class DottedSection:
     def is_left_sibling_of(self, other: "DottedSection") -> bool:
         """Returns True if this section is a left sibling of the other section
         """        
-        self_numbering = list(map(int, self.number.split('.')))
-        other_numbering = list(map(int, other.number.split('.')))
-        return other_numbering[:-1] == self_numbering[:-1] and other_numbering[-1] > self_numbering[-1]
+        self_numbering = self._num_tuple
+        other_numbering = other._num_tuple
+        return (
+            len(self_numbering) == len(other_numbering)
+            and other_numbering[-1] > self_numbering[-1]
+            and other_numbering[:-1] == self_numbering[:-1]
+        )
     
     def is_right_sibling_of(self, other: "DottedSection") -> bool:
         """Returns True if this section is a right sibling of the other section
         """
-        self_numbering = list(map(int, self.number.split('.')))
-        other_numbering = list(map(int, other.number.split('.')))
-        return other_numbering[:-1] == self_numbering[:-1] and other_numbering[-1] < self_numbering[-1]
+        self_numbering = self._num_tuple
+        other_numbering = other._num_tuple
+        return (
+            len(self_numbering) == len(other_numbering)
+            and other_numbering[-1] < self_numbering[-1]
+            and other_numbering[:-1] == self_numbering[:-1]
+        )
     
     def search(self, title: str) -> "DottedSection":
         """Returns the section node with the given title, or None if it doesn't exist
@@ -144,12 +192,18 @@ class DottedSection:
         _type_
             _description_
         """        
-        parent_sections = []
-        current = self
-        while current is not None:
-            parent_sections.append(current.title)
-            current = current.parent
-        return "In section: " + " -> ".join(list(reversed(parent_sections))) + ", part 1/1:\n" + self.content
+        return "In section: " + self.get_lineage() + ", part 1/1:\n" + self.content
+    
+    def get_lineage(self) -> str:
+        """Returns the section lineage with the format 1 Section -> 1.1 Subsection -> 1.1.1 Subsubsection.
+        It is cached on each node, and built from the parent's cached lineage.
+        """        
+        if self._lineage is None:
+            if self.parent is None:
+                self._lineage = self.title
+            else:
+                self._lineage = self.parent.get_lineage() + " -> " + self.title
+        return self._lineage
 
 
 
@@ -163,12 +217,18 @@ class SectionedDocumentParser:
     The parsing of different sectioning formats is handled by the passed `section_parser` argument.
     For different sectioning formats, you will have to subclass `DottedSection` and pass the new class as the `section_parser` argument.
     """
-    numbering_regex = r"\d+(\.\d+)*"
+    numbering_regex = r"\d+(?:\.\d+)*"
+    _NUMBERING_RE = re.compile(numbering_regex)
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._NUMBERING_RE = re.compile(cls.numbering_regex)
     
     def __init__(
         self,
         section_parser: DottedSection = None,
         max_chunk_length: int = 500,
+        regex_backend: str = "re",
     ):
         """
 
@@ -178,59 +238,89 @@ class SectionedDocumentParser:
             Class that splits the document based on specific sectioning formats, by default `DottedSection`
         max_chunk_length : int, optional
             Maximum number of words allowed in a chunk, by default 1000
+        regex_backend : str, optional
+            Regex engine used to find section titles, either "re" or "re2". RE2 scans in linear time
+            on any input, and requires the `google-re2` package. Note RE2's `\s` and `\d` only match ASCII
+            characters, so titles indented with e.g. non-breaking spaces (common in text extracted from PDFs)
+            are found by "re" but not by "re2", by default "re"
         """        
+        if regex_backend not in ("re", "re2"):
+            raise ValueError(f"Unsupported {regex_backend=}, expected 're' or 're2'")
         self.sectioner = section_parser or DottedSection
         self.max_chunk_length = max_chunk_length
+        self.regex_backend = regex_backend
+        # fail early if re2 is not installed
+        self._section_matcher()
+
+    def _section_matcher(self):
+        # compiled patterns are not stored on the instance so that it can be sent to worker processes in `split_batch`
+        if self.regex_backend == "re2":
+            return _compile_re2(self.sectioner.section_regex)
+        return self.sectioner._SECTION_RE
 
-    def validate_extracted_sections(self, sections: List[str]) -> list[str]:
-        # no all caps titles
-        valid_sections = [section for section in sections if not section.isupper()]
-        # no sections numbered higher than 99
-        def numbers_are_valid(section):
-            numbers = re.match(self.numbering_regex, section).group(0).split(".")
-            return all([len(_) <= 2 for _ in numbers])
-        valid_sections = [section for section in valid_sections if numbers_are_valid(section)]
+    def validate_extracted_sections(self, sections: List[str]) -> List[DottedSection]:
+        valid_sections = []
+        seen = set()
+        for section in sections:
+            # no repeated titles (e.g. table of contents entries) and no all caps titles
+            if section in seen or section.isupper():
+                continue
+            # no sections numbered higher than 99
+            numbers = self._NUMBERING_RE.match(section).group(0).split(".")
+            if any(len(number) > 2 for number in numbers):
+                continue
+            seen.add(section)
+            valid_sections.append(self.sectioner(section))
         if len(valid_sections) == 0:
             raise NoSectionsFound("No valid sections found in text")
         return valid_sections
     
     def extract_sections(self, text: str) -> List[str]:
-        sections = [groups[0] for groups in re.findall(self.sectioner.section_regex, text, re.MULTILINE)]
+        sections = [match.group(1) for match in self._section_matcher().finditer(text)]
         if len(sections) == 0:
             raise NoSectionsFound("No sections found in text")
         return sections
     
-    def build_section_tree(self, titles: str) -> DottedSection:
-        root = self.sectioner(title=titles[0])
-        current_section = root
-        for title in titles[1:]:
-            new_section = self.sectioner(title)
+    def build_section_tree(self, sections: List[DottedSection]) -> Tuple[DottedSection, Dict[str, DottedSection]]:
+        """Builds the section tree from sorted sections
+
+        Parameters
+        ----------
+        sections : List[DottedSection]
+            Sorted sections, without parent, children or sibling links
+
+        Returns
+        -------
+        Tuple[DottedSection, Dict[str, DottedSection]]
+            Root of the tree and a mapping from section title to tree node
+        """
+        root = sections[0]
+        title_index = {root.title: root}
+        # lineage of the last inserted section, from its root level ancestor down to the section itself
+        stack = [root]
+        for new_section in sections[1:]:
+            if not new_section.is_right_sibling_of(stack[-1]):
+                # backtrack to find the parent.
+                while not (new_section.is_child_of(stack[-1]) or len(stack) == 1):
+                    stack.pop()
+            current_section = stack[-1]
             if new_section.is_child_of(current_section):
                 current_section.children.append(new_section)
                 new_section.parent = current_section
             elif new_section.is_right_sibling_of(current_section):
                 current_section.right_sibling = new_section
                 new_section.parent = current_section.parent
+                stack.pop()
             else:
-                # backtrack to find the parent.
-                while not (new_section.is_child_of(current_section) or current_section.parent is None):
-                    current_section = current_section.parent
-                if new_section.is_child_of(current_section):
-                    current_section.children.append(new_section)
-                    new_section.parent = current_section
-                else:
-                    # current_section is at root level
-                    if new_section.is_right_sibling_of(current_section):
-                        current_section.right_sibling = new_section
-                        new_section.parent = current_section.parent
-                    # if not, discard the section as there can't be a left sibling at this point
-                    else:
-                        logging.info(f"Discarding section {new_section.title}")
-                        continue
+                # current_section is at root level and there can't be a left sibling at this point
+                logger.info(f"Discarding section {new_section.title}")
+                continue
             parent_title = new_section.parent.title if new_section.parent is not None else "(no parent section)"
-            logging.info(f"{parent_title} -> {new_section.title}")
-            current_section = new_section
-        return root
+            logger.debug(f"{parent_title} -> {new_section.title}")
+            stack.append(new_section)
+            # keep the first node for repeated titles, as a tree search would
+            title_index.setdefault(new_section.title, new_section)
+        return root, title_index
     
     def enrich_section_chunks(self, text: str, get_tree: bool = False) -> List[str]:
         """Adds the section lineage to each chunk
@@ -248,21 +338,20 @@ class SectionedDocumentParser:
             List of enriched chunks
         """        
         section_titles = self.extract_sections(text)
-        valid_titles = self.validate_extracted_sections(section_titles)
-        sorted_titles = sorted(valid_titles, key=lambda x: DottedSection(x))
+        sorted_sections = sorted(self.validate_extracted_sections(section_titles))
+        sorted_titles = [section.title for section in sorted_sections]
 
-        root = self.build_section_tree(sorted_titles)
+        root, title_index = self.build_section_tree(sorted_sections)
+        # find first occurrence of each section in text, scanning it once per section
+        section_starts = {title: text.find(title) for title in sorted_titles}
         for current_section, next_section in zip(sorted_titles, sorted_titles[1:]):
-            # find first occurrence of current_section in text
-            current_section_start = text.find(current_section)
-            next_section_start = text.find(next_section)
-            chunk = text[current_section_start:next_section_start]
-            chunk_node = root.search(current_section)
+            chunk = text[section_starts[current_section]:section_starts[next_section]]
+            chunk_node = title_index[current_section]
             chunk_node.content = chunk
 
         chunks = []
         for section in sorted_titles:
-            node = root.search(section)
+            node = title_index[section]
             if node.content is not None:
                 chunks.append(node.get_contextualised_content())
             else:  
@@ -307,21 +396,73 @@ class SectionedDocumentParser:
                 lineage_length = self.word_count(section_lineage)
                 adjusted_max_length = self.max_chunk_length - lineage_length
                 lines = lines[1:] # content lines (not lineage)
-                if any([self.word_count(line) > adjusted_max_length for line in lines]):
+                line_word_counts = [self.word_count(line) for line in lines]
+                if any(count > adjusted_max_length for count in line_word_counts):
                     raise ValueError(f"Single line in section {section_lineage} is longer than {adjusted_max_length=}")
                 sub_chunks = []
-                while len(lines) > 0:
-                    current_chunk = ""
+                i = 0
+                while i < len(lines):
+                    current_lines = []
                     current_len = 0
-                    while len(lines) > 0 and current_len + self.word_count(lines[0]) <= adjusted_max_length:
-                        new_line = lines.pop(0)
-                        current_chunk += new_line + "\n"
-                        current_len += self.word_count(new_line)
-                    sub_chunks.append(current_chunk)
+                    while i < len(lines) and current_len + line_word_counts[i] <= adjusted_max_length:
+                        current_lines.append(lines[i])
+                        current_len += line_word_counts[i]
+                        i += 1
+                    sub_chunks.append("\n".join(current_lines) + "\n")
+                # the part marker is appended at the end of the lineage, split around it once
+                marker_start = section_lineage.rindex("part 1/1")
+                lineage_prefix = section_lineage[:marker_start]
+                lineage_suffix = section_lineage[marker_start + len("part 1/1"):]
                 for k, sub_chunk in enumerate(sub_chunks):
-                    updated_section_lineage = section_lineage.replace("part 1/1", f"part {k + 1}/{len(sub_chunks)}")
-                    valid_chunks.append(updated_section_lineage + "\n" + sub_chunk)
+                    valid_chunks.append(f"{lineage_prefix}part {k + 1}/{len(sub_chunks)}{lineage_suffix}\n{sub_chunk}")
         return valid_chunks
+    
+    def split_batch(
+        self,
+        texts: List[str],
+        n_workers: int = None,
+        memory_efficient: bool = False,
+    ) -> Union[List[List[str]], Iterator[List[str]]]:
+        """Split multiple documents in parallel across processes. Documents are processed independently with `split`.
+        This is meant for ingestion outside AWS Lambda: process pools need `/dev/shm` semaphores, which the Lambda
+        runtime doesn't provide, so call `split` per document there instead.
+
+        Parameters
+        ----------
+        texts : List[str]
+            Documents' texts
+        n_workers : int, optional
+            Number of worker processes, by default the number of CPUs
+        memory_efficient : bool, optional
+            Whether to return a generator yielding each document's chunks in order, keeping only a bounded number of
+            documents in flight, instead of a list, by default False
+
+        Returns
+        -------
+        Union[List[List[str]], Iterator[List[str]]]
+            List of chunks for each document, in the same order as `texts`
+        """        
+        n_workers = n_workers or os.cpu_count() or 1
+        if memory_efficient:
+            return self._split_batch(texts, n_workers)
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            return list(executor.map(self.split, texts, chunksize=max(1, len(texts) // (n_workers * 4))))
+    
+    def _split_batch(self, texts: List[str], n_workers: int) -> Iterator[List[str]]:
+        # submit at most two documents per worker ahead of the consumer, so that finished
+        # results don't pile up in memory while earlier ones are still being read
+        executor = ProcessPoolExecutor(max_workers=n_workers)
+        pending = deque()
+        try:
+            for text in texts:
+                pending.append(executor.submit(self.split, text))
+                if len(pending) >= n_workers * 2:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            # don't process the remaining documents if the generator is closed early
+            executor.shutdown(cancel_futures=True)
                 
                 # split into smaller chunks
                 
@@ -11,8 +11,10 @@
 
 ############ imports
 import typing as t
+import asyncio
 import json
 import logging
+from functools import lru_cache
 
 import boto3
 from boto3 import Session
@@ -22,6 +24,7 @@ from langchain_community.embeddings.bedrock import BedrockEmbeddings
 from langchain.chains import create_retrieval_chain
 from langchain.chains.combine_documents import create_stuff_documents_chain
 from langchain_aws import ChatBedrock
+from langchain_core.documents import Document
 from langchain_core.prompts import ChatPromptTemplate
 
 
@@ -31,23 +34,26 @@ logger = logging.getLogger(__name__)
 
 # Use the session to create a client
 session = boto3.Session()
-credentials = session.get_credentials()
 
 ############ retrieve parameters from SSM
-def get_ssm_parameter(session: Session, parameter_name: str, prefix:str = '/bedrock-rag-template/'):
-    """Retrieve a parameter's value from AWS SSM Parameter Store.
+def get_ssm_parameters(session: Session, parameter_names: t.List[str], prefix:str = '/bedrock-rag-template/') -> t.Dict[str, str]:
+    """Retrieve several parameters' values from AWS SSM Parameter Store in a single request.
 
     Args:
         session (Session): the boto3 session to use to retrieve the parameters
-        parameter_name (str): the name of the parameter
-        prefix (str, optional): Parameter's prefix. Defaults to '/bedrock-rag-template/'.
+        parameter_names (t.List[str]): the names of the parameters (at most 10)
+        prefix (str, optional): Parameters' prefix. Defaults to '/bedrock-rag-template/'.
 
+    Returns:
+        t.Dict[str, str]: Mapping from parameter name (without prefix) to value
     """
     ssm = session.client('ssm')
-    response = ssm.get_parameter(
-        Name = prefix+parameter_name
+    response = ssm.get_parameters(
+        Names = [prefix+parameter_name for parameter_name in parameter_names]
     )
-    return response['Parameter']['Value']
+    if response['InvalidParameters']:
+        raise ValueError(f"Parameters not found in SSM: {response['InvalidParameters']}")
+    return {parameter['Name'][len(prefix):]: parameter['Value'] for parameter in response['Parameters']}
 
 def get_db_secret_value(secret_arn: str) -> str:
     """Get the secret value from the secret manager
@@ -62,48 +68,77 @@ def get_db_secret_value(secret_arn: str) -> str:
     get_secret_value_response = client.get_secret_value(SecretId=secret_arn)
     return json.loads(get_secret_value_response['SecretString'])
 
-# Setup env variables
-VECTOR_DB_INDEX = get_ssm_parameter(session, 'VECTOR_DB_INDEX')
-PG_VECTOR_DB_NAME = get_ssm_parameter(session, 'PG_VECTOR_DB_NAME')
-PG_VECTOR_PORT = get_ssm_parameter(session, 'PG_VECTOR_PORT')
-PG_VECTOR_SECRET_ARN = get_ssm_parameter(session, 'PG_VECTOR_SECRET_ARN')
-PG_VECTOR_DB_HOST = get_ssm_parameter(session, 'PG_VECTOR_DB_HOST')
-S3_BUCKET_NAME = get_ssm_parameter(session, 'S3_BUCKET_NAME')
-EMBEDDING_MODEL_ID = get_ssm_parameter(session, "EMBEDDING_MODEL_ID")
+# Setup env variables, retrieved on first use so that importing this module has no side effects
+@lru_cache(maxsize=1)
+def ssm_parameters() -> t.Dict[str, str]:
+    return get_ssm_parameters(session, [
+        'VECTOR_DB_INDEX',
+        'PG_VECTOR_DB_NAME',
+        'PG_VECTOR_PORT',
+        'PG_VECTOR_SECRET_ARN',
+        'PG_VECTOR_DB_HOST',
+        'S3_BUCKET_NAME',
+        'EMBEDDING_MODEL_ID',
+    ])
+
+@lru_cache(maxsize=1)
+def get_bedrock_runtime(session: Session):
+    """Get a bedrock-runtime client, shared by the embedding model and the LLMs
+
+    Args:
+        session (Session): the boto3 session to create the client from
+    """
+    return session.client("bedrock-runtime")
+
+@lru_cache
+def get_llm(llm_model_id: str) -> ChatBedrock:
+    """Get a chat model from AWS Bedrock, reusing it across RAG connections
+
+    Args:
+        llm_model_id (str): LLM model ID in AWS Bedrock
+    """
+    return ChatBedrock(
+        client=get_bedrock_runtime(session),
+        model_id=llm_model_id,
+    )
 
 def get_vector_store(session: Session) -> PGVector:
-    logger.info(f"Retrieve secret from {PG_VECTOR_SECRET_ARN}")
-    credentials = get_db_secret_value(PG_VECTOR_SECRET_ARN)
+    parameters = ssm_parameters()
+    logger.info(f"Retrieve secret from {parameters['PG_VECTOR_SECRET_ARN']}")
+    credentials = get_db_secret_value(parameters['PG_VECTOR_SECRET_ARN'])
 
-    br = session.client("bedrock-runtime")
-    bedrock_embedding = BedrockEmbeddings(client=br, model_id=EMBEDDING_MODEL_ID)
+    br = get_bedrock_runtime(session)
+    bedrock_embedding = BedrockEmbeddings(client=br, model_id=parameters['EMBEDDING_MODEL_ID'])
 
 
     connection_string = PGVector.connection_string_from_db_params(
         driver="psycopg2",
-        host=PG_VECTOR_DB_HOST,
-        port=PG_VECTOR_PORT,
-        database=PG_VECTOR_DB_NAME,
+        host=parameters['PG_VECTOR_DB_HOST'],
+        port=parameters['PG_VECTOR_PORT'],
+        database=parameters['PG_VECTOR_DB_NAME'],
         user=credentials['username'],
         password=credentials['password']
     )
 
     vector_store = PGVector(
         connection_string=connection_string,
-        collection_name=VECTOR_DB_INDEX,
+        collection_name=parameters['VECTOR_DB_INDEX'],
         embedding_function=bedrock_embedding,
         distance_strategy=DistanceStrategy.COSINE,
     )
     return vector_store
 
-# instantiate vector store as global object
-vector_store = get_vector_store(session)
+# instantiate vector store as global object on first use
+@lru_cache(maxsize=1)
+def vector_store() -> PGVector:
+    return get_vector_store(session)
 
 def get_rag_connection(
     llm_model_id: str,
     prompt: str,
     k: int = 5,
-) -> t.Callable[[str], str]:
+    asynchronous: bool = False,
+) -> t.Union[t.Callable[[str], str], t.Callable[[str], t.Awaitable[str]]]:
     """Create a connection a specified RAG model
 
     Parameters
@@ -114,13 +149,15 @@ def get_rag_connection(
         Prompt to use for the RAG mode.
     k : int, optional
         Number of documents to retrieve, by default 5
+    asynchronous : bool, optional
+        Whether to return a coroutine function, for use in async servers, by default False
 
     Returns
     -------
-    t.Callable[str, str]
+    t.Union[t.Callable[[str], str], t.Callable[[str], t.Awaitable[str]]]
         Function that takes a user query and returns the LLM's output
     """    
-    retriever=vector_store.as_retriever(search_type="similarity",
+    retriever=vector_store().as_retriever(search_type="similarity",
                                     search_kwargs={'k': k})
     prompt = ChatPromptTemplate.from_messages(
         [
@@ -129,9 +166,7 @@ def get_rag_connection(
         ]
     )
 
-    llm = ChatBedrock(
-        model_id=llm_model_id,
-    )
+    llm = get_llm(llm_model_id)
 
     question_answer_chain = create_stuff_documents_chain(llm, prompt)
     chain = create_retrieval_chain(retriever, question_answer_chain)
@@ -139,7 +174,10 @@ def get_rag_connection(
     def invoke_rag(query: str) -> str:
         return chain.invoke({"input": query})["answer"]
     
-    return invoke_rag
+    async def ainvoke_rag(query: str) -> str:
+        return (await chain.ainvoke({"input": query}))["answer"]
+    
+    return ainvoke_rag if asynchronous else invoke_rag
 
 
 
@@ -163,13 +201,39 @@ def retrieve(
     t.List[t.Dict[str, t.Any]]
         List of retrieved documents
     """    
-    doc_scores = vector_store.similarity_search_with_relevance_scores(query, k=k)
-    retrieved = []
-    for doc, score in doc_scores:
-        doc_dict = doc.dict()
-        doc_dict["score"] = score
-        retrieved.append(doc_dict)
-    return retrieved
+    doc_scores = vector_store().similarity_search_with_relevance_scores(query, k=k)
+    return _to_retrieved(doc_scores)
+
+async def retrieve_batch(
+    queries: t.List[str],
+    k: int,
+) -> t.List[t.List[t.Dict[str, t.Any]]]:
+    """Retrieve relevant documents for several queries concurrently from the vector store
+
+    Parameters
+    ----------
+    queries : t.List[str]
+        Queries to search for
+    k : int
+        Number of documents to retrieve per query
+
+    Returns
+    -------
+    t.List[t.List[t.Dict[str, t.Any]]]
+        List of retrieved documents for each query, in the same order as `queries`
+    """    
+    store = vector_store()
+    doc_scores_per_query = await asyncio.gather(
+        *[store.asimilarity_search_with_relevance_scores(query, k=k) for query in queries]
+    )
+    return [_to_retrieved(doc_scores) for doc_scores in doc_scores_per_query]
+
+def _to_retrieved(doc_scores: t.List[t.Tuple[Document, float]]) -> t.List[t.Dict[str, t.Any]]:
+    """Format documents and their relevance scores as JSON serialisable dictionaries"""
+    return [
+        {"page_content": doc.page_content, "metadata": doc.metadata, "score": score}
+        for doc, score in doc_scores
+    ]
 
 # for item in docs:
 #     print(item)
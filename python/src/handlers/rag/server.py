@@ -2,16 +2,22 @@ import logging
 import os
 import sys
 import traceback
+import typing as t
+from contextlib import asynccontextmanager
+from functools import lru_cache
 
-from flask import Flask, request, jsonify
+import uvicorn
+from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
 from rag import get_rag_connection, retrieve
 
-app = Flask(__name__)
 # Set up logging to `stdout`
+logger = logging.getLogger(__name__)
 handler = logging.StreamHandler(sys.stdout)
 handler.setLevel(logging.INFO)  # You can set to DEBUG, WARNING, etc., as needed
-app.logger.addHandler(handler)
-app.logger.setLevel(logging.INFO)
+logger.addHandler(handler)
+logger.setLevel(logging.INFO)
 
 DEFAULT_PROMPT = (
     "You are an assistant to maintenance engineers in a semiconductor factory. "
@@ -24,74 +30,102 @@ DEFAULT_PROMPT = (
 # DEFAULT_MODEL_ID = "meta.llama3-70b-instruct-v1:0"
 DEFAULT_MODEL_ID = "anthropic.claude-3-5-sonnet-20240620-v1:0"
 DEFAULT_K = 5
-DEFAULT_RAG = get_rag_connection(llm_model_id=DEFAULT_MODEL_ID, prompt=DEFAULT_PROMPT, k=DEFAULT_K)
+# reuse RAG chains across requests with the same configuration; keyword arguments must be
+# passed in the same order for calls to share a cache entry
+get_rag_connection = lru_cache(maxsize=32)(get_rag_connection)
+
+def get_default_rag() -> t.Callable[[str], t.Awaitable[str]]:
+    return get_rag_connection(llm_model_id=DEFAULT_MODEL_ID, prompt=DEFAULT_PROMPT, k=DEFAULT_K, asynchronous=True)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # build the default RAG chain at startup, so that the server fails at boot if it can't be built
+    # and the first request doesn't pay for the secret retrieval and database setup
+    await run_in_threadpool(get_default_rag)
+    yield
+
+app = FastAPI(lifespan=lifespan)
 
 # /rag route to handle RAG queries
-@app.route('/rag', methods=['GET'])
-def rag():
+@app.get('/rag')
+async def rag_default(query: t.Optional[str] = None):
     # Mandatory parameter 'query'
-    query = request.args.get('query')
     if not query:
-        return jsonify({"error": "The 'query' parameter is required"}), 400
+        return JSONResponse({"error": "The 'query' parameter is required"}, status_code=400)
 
     # Call the RAG model with the query
     try:
-        result = DEFAULT_RAG(query)
+        # built at startup and reused from the cache; construction is blocking, run it outside the event loop
+        default_rag = await run_in_threadpool(get_default_rag)
+        result = await default_rag(query)
         # Return the result as a JSON response
-        return jsonify({"output": result})
+        return {"output": result}
     
     except Exception as e:
+        logger.exception(f"Request failed for {query=}")
         trace = traceback.format_exc()
-        return jsonify({"error": str(e), "trace": trace}), 500
+        return JSONResponse({"error": str(e), "trace": trace}, status_code=500)
 
 
 # /rag route to test RAG configurations
-@app.route('/test_rag', methods=['GET'])
-def test_rag():
+@app.get('/test_rag')
+async def rag_test(
+    query: t.Optional[str] = None,
+    model_id: str = DEFAULT_MODEL_ID,
+    k: int = DEFAULT_K,  # Default top-k retrieval is 5
+    prompt: str = DEFAULT_PROMPT,
+):
     # Mandatory parameter 'query'
-    query = request.args.get('query')
     if not query:
-        return jsonify({"error": "The 'query' parameter is required"}), 400
+        return JSONResponse({"error": "The 'query' parameter is required"}, status_code=400)
 
-    # Optional parameters with defaults
-    model_id = request.args.get('model_id', DEFAULT_MODEL_ID)
-    k = int(request.args.get('k', DEFAULT_K))  # Default top-k retrieval is 5
-    prompt = request.args.get('prompt', DEFAULT_PROMPT)
     # add context interpolation to prompt if not already present
     if "{context}" not in prompt:
         prompt =f"{prompt}. Context: {{context}}"
     try:
-        # Instantiate the RAG system using the provided parameters
-        rag_model = get_rag_connection(llm_model_id=model_id, k=k, prompt=prompt)
+        # Instantiate the RAG system using the provided parameters, or reuse a cached one.
+        # Construction is blocking, run it outside the event loop
+        rag_model = await run_in_threadpool(
+            get_rag_connection, llm_model_id=model_id, prompt=prompt, k=k, asynchronous=True,
+        )
 
         # Call the RAG model with the query
-        result = rag_model(query)
+        result = await rag_model(query)
         # Return the result as a JSON response
-        return jsonify({"output": result})
+        return {"output": result}
     
     except Exception as e:
+        logger.exception(f"Request failed for {query=}")
         trace = traceback.format_exc()
-        return jsonify({"error": str(e), "trace": trace}), 500
+        return JSONResponse({"error": str(e), "trace": trace}, status_code=500)
     
 # /rag route to test RAG configurations
-@app.route('/test_retrieval', methods=['GET'])
-def test_retrieval():
+@app.get('/test_retrieval')
+async def retrieval_test(
+    query: t.Optional[str] = None,
+    k: int = DEFAULT_K,  # Default top-k retrieval is 5
+):
     # Mandatory parameter 'query'
-    query = request.args.get('query')
     if not query:
-        return jsonify({"error": "The 'query' parameter is required"}), 400
-
-    # Optional parameters with defaults
-    k = int(request.args.get('k', DEFAULT_K))  # Default top-k retrieval is 5
+        return JSONResponse({"error": "The 'query' parameter is required"}, status_code=400)
 
     try:
-        retrieved = retrieve(query, k)
+        # retrieval is blocking, run it outside the event loop
+        retrieved = await run_in_threadpool(retrieve, query, k)
         # Return the result as a JSON response
-        return jsonify({"output": retrieved})
+        return {"output": retrieved}
     
     except Exception as e:
+        logger.exception(f"Request failed for {query=}")
         trace = traceback.format_exc()
-        return jsonify({"error": str(e), "trace": trace}), 500
+        return JSONResponse({"error": str(e), "trace": trace}, status_code=500)
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', debug=True)
+    # number of worker processes is taken from the WEB_CONCURRENCY env variable, 1 by default
+    uvicorn.run(
+        "server:app",
+        host='0.0.0.0',
+        port=5000,
+        workers=int(os.getenv("WEB_CONCURRENCY", "1")),
+        loop="uvloop",
+    )
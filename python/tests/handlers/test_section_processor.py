@@ -0,0 +1,144 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+import pytest
+
+from python.src.handlers.data_ingestion_processor.section_processor import (
+    DottedSection, SectionedDocumentParser)
+
+
+def build_tree(titles):
+    parser = SectionedDocumentParser()
+    return parser.build_section_tree([DottedSection(title) for title in titles])
+
+
+def test_build_section_tree_shape():
+    """Test skipped numbering levels, backtracking several levels and root level siblings."""
+    root, title_index = build_tree([
+        "1 Intro",
+        "1.2.3 Skipped Levels",
+        "1.2.3.1 Deep",
+        "1.2.3.1.1 Deeper",
+        "1.4 Backtracked",
+        "2 Second",
+        "2.1 Child of Second",
+    ])
+    intro, skipped, deep, deeper, backtracked, second, second_child = (
+        title_index[title] for title in [
+            "1 Intro",
+            "1.2.3 Skipped Levels",
+            "1.2.3.1 Deep",
+            "1.2.3.1.1 Deeper",
+            "1.4 Backtracked",
+            "2 Second",
+            "2.1 Child of Second",
+        ]
+    )
+
+    assert root is intro
+    assert intro.parent is None
+    assert intro.children == [skipped, backtracked]
+    assert intro.right_sibling is second
+
+    assert skipped.parent is intro
+    assert skipped.children == [deep]
+    assert skipped.right_sibling is None
+    assert deep.parent is skipped
+    assert deeper.parent is deep
+
+    # backtracking past several levels links the parent, not a sibling
+    assert backtracked.parent is intro
+    assert backtracked.right_sibling is None
+
+    assert second.parent is None
+    assert second.children == [second_child]
+    assert second_child.parent is second
+
+
+def test_build_section_tree_discards_sections_without_place():
+    """Sections that are neither children nor right siblings at root level are discarded."""
+    root, title_index = build_tree(["1.1 First", "1.2 Second", "2 Discarded"])
+
+    assert root.title == "1.1 First"
+    assert root.right_sibling is title_index["1.2 Second"]
+    assert title_index["1.2 Second"].parent is None
+    assert title_index["1.2 Second"].right_sibling is None
+    assert "2 Discarded" not in title_index
+
+
+def test_validate_extracted_sections_filters_and_dedupes():
+    """Repeated (e.g. table of contents) titles are kept once; all caps titles and numbers over 99 are dropped."""
+    parser = SectionedDocumentParser()
+    sections = parser.validate_extracted_sections([
+        "1 Intro",
+        "1.1 Scope",
+        "1 Intro",
+        "2 SAFETY NOTES",
+        "100 Page Number",
+        "1.100 Page Number",
+        "1.1 Scope",
+    ])
+
+    assert [section.title for section in sections] == ["1 Intro", "1.1 Scope"]
+
+
+def test_split_yields_one_chunk_per_repeated_title():
+    text = "\n".join([
+        "  1 Intro",
+        "  1.1 Scope",
+        "  1 Intro",
+        "intro text",
+        "  1.1 Scope",
+        "scope text",
+        "  2 End",
+    ])
+    chunks = SectionedDocumentParser().split(text)
+
+    assert [chunk.split("\n")[0] for chunk in chunks] == [
+        "In section: 1 Intro, part 1/1:",
+        "In section: 1 Intro -> 1.1 Scope, part 1/1:",
+    ]
+
+
+def test_lineage_is_reset_when_reparenting():
+    root, title_index = build_tree(["1 Intro", "1.1 Scope", "1.1.1 Detail", "2 Second"])
+    detail = title_index["1.1.1 Detail"]
+    assert detail.get_lineage() == "1 Intro -> 1.1 Scope -> 1.1.1 Detail"
+
+    title_index["2 Second"].add_child(title_index["1.1 Scope"])
+
+    assert detail.get_lineage() == "2 Second -> 1.1 Scope -> 1.1.1 Detail"
+
+
+def test_split_batch_matches_split():
+    texts = [
+        "\n".join([f"  {n} Intro", *["intro text"] * (3 * n), f"  {n}.1 Scope", "scope text", f"  {n + 1} End"])
+        for n in range(1, 6)
+    ]
+    parser = SectionedDocumentParser(max_chunk_length=20)
+    expected = [parser.split(text) for text in texts]
+
+    assert parser.split_batch(texts, n_workers=2) == expected
+    assert list(parser.split_batch(texts, n_workers=2, memory_efficient=True)) == expected
+
+
+def test_re2_backend_matches_re_backend():
+    pytest.importorskip("re2")
+    text = "\n".join([
+        "  TABLE OF CONTENTS",
+        "  1 Intro",
+        "  1.1 Scope of the Manual",
+        "  1 Intro",
+        "intro text",
+        "  1.1 Scope of the Manual",
+        "scope text, see 1.2 Safety",
+        "\t1.2 Safety (Read First) and Warnings",
+        "  1.2.1 Gas/Liquid Hazards",
+        "  2 MAINTENANCE",
+        "  2 Maintenance Procedures",
+        "  100 Page Number",
+    ])
+
+    assert (
+        SectionedDocumentParser(regex_backend="re2").extract_sections(text)
+        == SectionedDocumentParser().extract_sections(text)
+    )